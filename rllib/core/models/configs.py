@@ -487,6 +487,9 @@ class CNNEncoderConfig(ModelConfig):
             contains elements of the form
             `[number of channels/filters, [kernel width, kernel height], stride]` to
             specify a convolutional layer stacked in order of the outer list.
+            When training under a "mixed_float16" Keras policy, numbers of filters
+            that are multiples of 8 allow cuDNN to pick its (NHWC) Tensor Core
+            kernels.
         cnn_activation: The activation function to use after each layer (
             except for the output).
         cnn_use_layernorm: Whether to insert a LayerNorm functionality
@@ -658,7 +661,8 @@ class LSTMEncoderConfig(ModelConfig):
     Attributes:
         input_dims: A 1D tensor indicating the input dimension, e.g. `[32]`.
         hidden_dim: The size of the hidden internal states (h- and c-states) of the
-            LSTM layer(s).
+            LSTM layer(s). When training under a "mixed_float16" Keras policy,
+            multiples of 8 allow the GPU to use its Tensor Cores.
         num_lstm_layers: The number of LSTM layers to stack.
         batch_major: Wether the input is batch major (B, T, ..) or
             time major (T, B, ..).
@@ -5,7 +5,7 @@ from ray.rllib.core.models.base import ENCODER_OUT, STATE_OUT
 from ray.rllib.core.models.configs import CNNEncoderConfig
 from ray.rllib.models.utils import get_filter_config
 from ray.rllib.utils.framework import try_import_tf, try_import_torch
-from ray.rllib.utils.test_utils import framework_iterator, ModelChecker
+from ray.rllib.utils.test_utils import check, framework_iterator, ModelChecker
 
 _, tf, _ = try_import_tf()
 torch, _ = try_import_torch()
@@ -90,6 +90,35 @@ class TestCNNEncoders(unittest.TestCase):
             # Check all added models against each other.
             model_checker.check()
 
+    def test_tf_cnn_encoder_batch_bucket_padding(self):
+        """Tests that padding batches to XLA buckets doesn't alter the outputs."""
+        config = CNNEncoderConfig(
+            input_dims=[10, 10, 3],
+            cnn_filter_specifiers=get_filter_config([10, 10, 3]),
+            cnn_use_layernorm=True,
+            output_dims=[4],
+        )
+        encoder = config.build(framework="tf2")
+        # Record the (padded) batch size that reaches the compiled forward pass.
+        padded_batch_size = tf.Variable(0)
+        forward_compiled = encoder._forward_compiled
+
+        def _forward_compiled(obs):
+            padded_batch_size.assign(tf.shape(obs)[0])
+            return forward_compiled(obs)
+
+        encoder._forward_compiled = _forward_compiled
+
+        # 3 gets padded to 8, 600 (larger than the largest bucket) to 2 * 512.
+        for batch_size, padded in [(3, 8), (600, 1024)]:
+            obs = tf.random.uniform((batch_size, 10, 10, 3))
+            outputs = encoder.call_tensors(obs)
+            self.assertEqual(padded_batch_size.numpy(), padded)
+            self.assertEqual(outputs.shape, (batch_size, 4))
+            # Compare against single-sample (never padded) forward passes.
+            for i in range(0, batch_size, 97):
+                check(outputs[i : i + 1], encoder.call_tensors(obs[i : i + 1]))
+
 
 if __name__ == "__main__":
     import pytest
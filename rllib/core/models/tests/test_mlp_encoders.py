@@ -3,8 +3,11 @@ import unittest
 
 from ray.rllib.core.models.configs import MLPEncoderConfig
 from ray.rllib.core.models.base import STATE_OUT, ENCODER_OUT
+from ray.rllib.core.models.specs.specs_dict import SpecDict
+from ray.rllib.core.models.specs.specs_tf import TfTensorSpec
 from ray.rllib.utils.framework import try_import_tf, try_import_torch
-from ray.rllib.utils.test_utils import framework_iterator, ModelChecker
+from ray.rllib.policy.sample_batch import SampleBatch
+from ray.rllib.utils.test_utils import check, framework_iterator, ModelChecker
 
 _, tf, _ = try_import_tf()
 torch, _ = try_import_torch()
@@ -76,6 +79,69 @@ class TestMLPEncoders(unittest.TestCase):
             # Check all added models against each other.
             model_checker.check()
 
+    def test_tf_mlp_encoder_batch_bucket_padding(self):
+        """Tests that padding batches to XLA buckets doesn't alter the outputs."""
+        config = MLPEncoderConfig(
+            input_dims=[8],
+            hidden_layer_dims=[16],
+            hidden_layer_use_layernorm=True,
+            output_dims=[4],
+        )
+        encoder = config.build(framework="tf2")
+        # Record the (padded) batch size that reaches the compiled forward pass.
+        padded_batch_size = tf.Variable(0)
+        forward_compiled = encoder._forward_compiled
+
+        def _forward_compiled(obs):
+            padded_batch_size.assign(tf.shape(obs)[0])
+            return forward_compiled(obs)
+
+        encoder._forward_compiled = _forward_compiled
+        # Inside a tf.function with an unknown batch size, the bucket has to be
+        # picked at run time (from the dynamic batch size tensor).
+        traced_encoder = tf.function(
+            lambda obs: encoder({SampleBatch.OBS: obs})[ENCODER_OUT],
+            input_signature=[tf.TensorSpec([None, 8])],
+        )
+
+        # 5 gets padded to 8, 600 (larger than the largest bucket) to 2 * 512.
+        for batch_size, padded in [(5, 8), (600, 1024)]:
+            obs = tf.random.uniform((batch_size, 8))
+            outputs = encoder({SampleBatch.OBS: obs})[ENCODER_OUT]
+            self.assertEqual(padded_batch_size.numpy(), padded)
+            traced_outputs = traced_encoder(obs)
+            self.assertEqual(padded_batch_size.numpy(), padded)
+            self.assertEqual(outputs.shape, (batch_size, 4))
+            self.assertEqual(traced_outputs.shape, (batch_size, 4))
+            # Compare against single-sample (never padded) forward passes.
+            for i in range(0, batch_size, 97):
+                single = encoder({SampleBatch.OBS: obs[i : i + 1]})[ENCODER_OUT]
+                check(outputs[i : i + 1], single)
+                check(traced_outputs[i : i + 1], single)
+
+    def test_tf_mlp_encoder_cached_specs(self):
+        """Tests that only the first call checks the specs and later calls work."""
+        config = MLPEncoderConfig(
+            input_dims=[8], hidden_layer_dims=[16], output_dims=[4]
+        )
+        encoder = config.build(framework="tf2")
+
+        obs = tf.random.uniform((3, 8))
+        first = encoder({SampleBatch.OBS: obs})[ENCODER_OUT]
+
+        # Swap in specs that the data does not match. The second call must skip the
+        # validation and still compute the same outputs.
+        encoder._input_specs = SpecDict({SampleBatch.OBS: TfTensorSpec("b, d", d=5)})
+        encoder._output_specs = SpecDict({ENCODER_OUT: TfTensorSpec("b, d", d=5)})
+        second = encoder({SampleBatch.OBS: obs})[ENCODER_OUT]
+        check(first, second)
+
+        # Spec checks are cached per instance: a new encoder still validates.
+        encoder = config.build(framework="tf2")
+        encoder._input_specs = SpecDict({SampleBatch.OBS: TfTensorSpec("b, d", d=5)})
+        with self.assertRaises(ValueError):
+            encoder({SampleBatch.OBS: obs})
+
 
 if __name__ == "__main__":
     import pytest
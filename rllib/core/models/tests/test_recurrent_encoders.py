@@ -1,9 +1,13 @@
 import itertools
 import unittest
 
-from ray.rllib.core.models.base import ENCODER_OUT, STATE_OUT
+from ray.rllib.core.models.base import ENCODER_OUT, STATE_IN, STATE_OUT
 from ray.rllib.core.models.configs import LSTMEncoderConfig
-from ray.rllib.utils.test_utils import framework_iterator, ModelChecker
+from ray.rllib.policy.sample_batch import SampleBatch
+from ray.rllib.utils.framework import try_import_tf
+from ray.rllib.utils.test_utils import check, framework_iterator, ModelChecker
+
+_, tf, _ = try_import_tf()
 
 
 class TestRecurrentEncoders(unittest.TestCase):
@@ -72,6 +76,14 @@ class TestRecurrentEncoders(unittest.TestCase):
                     outputs[STATE_OUT]["c"].shape,
                     (1, num_lstm_layers, hidden_dim),
                 )
+                # Initial state shapes: [num_layers, [hidden_dim]]
+                initial_state = model_checker.models[fw].get_initial_state()
+                self.assertEqual(
+                    initial_state["h"].shape, (num_lstm_layers, hidden_dim)
+                )
+                self.assertEqual(
+                    initial_state["c"].shape, (num_lstm_layers, hidden_dim)
+                )
 
             # Check all added models against each other (only if bias=False).
             # See here on why pytorch uses two bias vectors per layer and tf only uses
@@ -81,6 +93,29 @@ class TestRecurrentEncoders(unittest.TestCase):
             if use_bias is False:
                 model_checker.check()
 
+    def test_tf_lstm_encoder_call_tensors(self):
+        """Tests the plain-tensor `call_tensors` API of the tf LSTM encoder."""
+        config = LSTMEncoderConfig(
+            input_dims=[4],
+            num_lstm_layers=2,
+            hidden_dim=8,
+            output_dims=[3],
+        )
+        encoder = config.build(framework="tf2")
+
+        obs = tf.random.uniform((5, 7, 4))
+        initial_state = {
+            k: tf.stack([v] * 5) for k, v in encoder.get_initial_state().items()
+        }
+        outputs = encoder({SampleBatch.OBS: obs, STATE_IN: initial_state})
+
+        # Omitting the states should be the same as passing in the initial states.
+        out, h, c = encoder.call_tensors(obs)
+        self.assertEqual(out.shape, (5, 7, 3))
+        check(out, outputs[ENCODER_OUT])
+        check(h, outputs[STATE_OUT]["h"])
+        check(c, outputs[STATE_OUT]["c"])
+
 
 if __name__ == "__main__":
     import pytest
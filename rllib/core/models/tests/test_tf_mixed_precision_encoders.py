@@ -0,0 +1,73 @@
+import unittest
+
+from ray.rllib.core.models.base import ENCODER_OUT, STATE_IN, STATE_OUT
+from ray.rllib.core.models.configs import (
+    CNNEncoderConfig,
+    LSTMEncoderConfig,
+    MLPEncoderConfig,
+)
+from ray.rllib.models.utils import get_filter_config
+from ray.rllib.policy.sample_batch import SampleBatch
+from ray.rllib.utils.framework import try_import_tf
+
+_, tf, _ = try_import_tf()
+
+
+class TestTfMixedPrecisionEncoders(unittest.TestCase):
+    def test_tf_encoders_under_mixed_float16(self):
+        """Tests that the tf encoders run and output float32 under mixed_float16."""
+        tf.keras.mixed_precision.set_global_policy("mixed_float16")
+        try:
+            # CNN encoder.
+            encoder = CNNEncoderConfig(
+                input_dims=[10, 10, 3],
+                cnn_filter_specifiers=get_filter_config([10, 10, 3]),
+                output_dims=[4],
+            ).build(framework="tf2")
+            outputs = encoder(
+                {
+                    SampleBatch.OBS: tf.random.uniform((2, 10, 10, 3)),
+                    STATE_IN: None,
+                    SampleBatch.SEQ_LENS: None,
+                }
+            )
+            self.assertEqual(outputs[ENCODER_OUT].dtype, tf.float32)
+
+            # MLP encoder.
+            encoder = MLPEncoderConfig(
+                input_dims=[8],
+                hidden_layer_dims=[16],
+                output_dims=[4],
+            ).build(framework="tf2")
+            outputs = encoder({SampleBatch.OBS: tf.random.uniform((2, 8))})
+            self.assertEqual(outputs[ENCODER_OUT].dtype, tf.float32)
+
+            # LSTM encoder (float32 observations and states go in).
+            encoder = LSTMEncoderConfig(
+                input_dims=[4],
+                num_lstm_layers=2,
+                hidden_dim=8,
+                output_dims=[4],
+            ).build(framework="tf2")
+            initial_state = {
+                k: tf.stack([v] * 2) for k, v in encoder.get_initial_state().items()
+            }
+            outputs = encoder(
+                {
+                    SampleBatch.OBS: tf.random.uniform((2, 3, 4)),
+                    STATE_IN: initial_state,
+                }
+            )
+            self.assertEqual(outputs[ENCODER_OUT].dtype, tf.float32)
+            # The outgoing states must have the same dtype as the initial ones.
+            self.assertEqual(outputs[STATE_OUT]["h"].dtype, tf.float32)
+            self.assertEqual(outputs[STATE_OUT]["c"].dtype, tf.float32)
+        finally:
+            tf.keras.mixed_precision.set_global_policy("float32")
+
+
+if __name__ == "__main__":
+    import pytest
+    import sys
+
+    sys.exit(pytest.main(["-v", __file__]))
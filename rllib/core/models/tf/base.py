@@ -1,5 +1,5 @@
 import abc
-from typing import Tuple
+from typing import Mapping, Tuple
 
 import numpy as np
 
@@ -67,3 +67,34 @@ class TfModel(Model, tf.keras.Model, abc.ABC):
         for i, w in enumerate(self.trainable_weights + self.non_trainable_weights):
             fill_val = value_sequence[i % len(value_sequence)]
             w.assign(tf.fill(w.shape, fill_val))
+
+
+class TfCachedSpecsModel(TfModel):
+    """A TfModel that only checks its input- and output specs on the first call.
+
+    Use this for models on the hot path (e.g. encoders), whose input- and output
+    structures and shapes don't change after the first forward pass, such that
+    re-validating them on each call would be pure python overhead.
+    """
+
+    @override(TfModel)
+    @check_input_specs("input_specs", cache=True)
+    @check_output_specs("output_specs", cache=True)
+    def call(self, input_dict: NestedDict, **kwargs) -> Mapping:
+        """Returns the output of this model for the given input.
+
+        Only the very first call validates `input_dict` and the returned outputs
+        against the specs. Note that only this first call also converts a plain
+        dict `input_dict` into a NestedDict. All following calls pass `input_dict`
+        to `_forward()` as-is, so it must already be nested the way `_forward()`
+        indexes it (e.g. a NestedDict or nested python dicts). Flat, tuple-keyed
+        dicts, like `{("state_in", "h"): ...}`, are not supported.
+
+        Args:
+            input_dict: The input tensors.
+            **kwargs: Forward compatibility kwargs.
+
+        Returns:
+            The output tensors.
+        """
+        return self._forward(input_dict, **kwargs)
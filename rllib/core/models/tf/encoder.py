@@ -1,6 +1,5 @@
-from typing import Optional
-
-import tree  # pip install dm_tree
+import logging
+from typing import Dict, Optional
 
 from ray.rllib.core.models.base import (
     Encoder,
@@ -9,14 +8,14 @@ from ray.rllib.core.models.base import (
     STATE_OUT,
     ENCODER_OUT,
 )
-from ray.rllib.core.models.base import Model
+from ray.rllib.core.models.base import Model, ModelConfig
 from ray.rllib.core.models.configs import (
     ActorCriticEncoderConfig,
     CNNEncoderConfig,
     LSTMEncoderConfig,
     MLPEncoderConfig,
 )
-from ray.rllib.core.models.tf.base import TfModel
+from ray.rllib.core.models.tf.base import TfCachedSpecsModel, TfModel
 from ray.rllib.core.models.tf.primitives import TfMLP, TfCNN
 from ray.rllib.core.models.specs.specs_base import Spec
 from ray.rllib.core.models.specs.specs_dict import SpecDict
@@ -26,9 +25,98 @@ from ray.rllib.policy.sample_batch import SampleBatch
 from ray.rllib.utils.annotations import override
 from ray.rllib.utils.framework import try_import_tf
 from ray.rllib.utils.nested_dict import NestedDict
+from ray.util import log_once
 
 _, tf, _ = try_import_tf()
 
+logger = logging.getLogger(__name__)
+
+# XLA compiles one program per distinct input shape. Hence, we zero-pad the batch
+# dimension of the inputs to our XLA-compiled forward passes to the next of these
+# sizes. Larger batches (e.g. train batches or value passes over long trajectories)
+# are padded to the next multiple of the largest size. This way, we compile once per
+# bucket (or multiple of the largest bucket) actually seen, instead of once per
+# distinct batch size.
+_XLA_BATCH_BUCKETS = (1, 8, 32, 128, 512)
+
+
+def _call_with_batch_bucket_padding(fn, inputs):
+    """Calls `fn` on `inputs`, zero-padded along the batch axis to a bucket size.
+
+    Args:
+        fn: The (XLA-compiled) function to call. Must map a batch of inputs to a
+            batch of outputs without mixing information across the batch axis.
+        inputs: The input tensor. Its first axis is the batch axis.
+
+    Returns:
+        The outputs of `fn`, sliced back to the original batch size of `inputs`.
+    """
+    batch_size = inputs.shape[0]
+    if batch_size is not None:
+        largest = _XLA_BATCH_BUCKETS[-1]
+        bucket = next(
+            (b for b in _XLA_BATCH_BUCKETS if b >= batch_size),
+            -(-batch_size // largest) * largest,
+        )
+        if bucket == batch_size:
+            return fn(inputs)
+    else:
+        # Batch size unknown at trace time.
+        batch_size = tf.shape(inputs)[0]
+        buckets = tf.constant(_XLA_BATCH_BUCKETS)
+        largest = buckets[-1]
+        bucket = tf.reduce_min(
+            tf.where(
+                buckets >= batch_size,
+                buckets,
+                (batch_size + largest - 1) // largest * largest,
+            )
+        )
+
+    paddings = [[0, bucket - batch_size]] + [[0, 0]] * (inputs.shape.rank - 1)
+    return fn(tf.pad(inputs, paddings))[:batch_size]
+
+
+class _TfXLAEncoderMixin:
+    """Shared, XLA-compiled forward pass of the obs-only tf encoders (CNN and MLP).
+
+    Subclasses must build their network as `self.net` (mapping a batch of
+    observations to a batch of encoder outputs) before calling this mixin's
+    `__init__`.
+    """
+
+    def __init__(self, config: ModelConfig):
+        # Compile the whole network with XLA, such that the individual ops get fused
+        # into as few kernels as possible. Pin the input signature (with an undefined
+        # batch dimension) to avoid retracing on each new batch size.
+        self._forward_compiled = tf.function(
+            self._forward_impl,
+            input_signature=[
+                tf.TensorSpec([None, *config.input_dims], self.compute_dtype)
+            ],
+            jit_compile=True,
+        )
+
+    def call_tensors(self, obs):
+        """Computes the encoder outputs for a batch of observations.
+
+        Unlike `__call__`, this takes and returns plain tensors (no NestedDicts), so
+        it can be used inside `tf.function`s or mapped over a `tf.data.Dataset`, e.g.
+        `dataset.map(encoder.call_tensors, num_parallel_calls=tf.data.AUTOTUNE)`.
+
+        Args:
+            obs: The batch of observations of shape (B, *input_dims).
+
+        Returns:
+            The encoder outputs of shape (B, output_dims[0]).
+        """
+        return _call_with_batch_bucket_padding(
+            self._forward_compiled, tf.cast(obs, self.compute_dtype)
+        )
+
+    def _forward_impl(self, obs):
+        return self.net(obs)
+
 
 class TfActorCriticEncoder(TfModel, ActorCriticEncoder):
     """An encoder that can hold two encoders."""
@@ -42,7 +130,7 @@ class TfActorCriticEncoder(TfModel, ActorCriticEncoder):
         ActorCriticEncoder.__init__(self, config)
 
 
-class TfCNNEncoder(TfModel, Encoder):
+class TfCNNEncoder(_TfXLAEncoderMixin, TfCachedSpecsModel, Encoder):
     def __init__(self, config: CNNEncoderConfig) -> None:
         TfModel.__init__(self, config)
         Encoder.__init__(self, config)
@@ -64,13 +152,20 @@ class TfCNNEncoder(TfModel, Encoder):
         # Add a final linear layer to make sure that the outputs have the correct
         # dimensionality (output_dims).
         output_activation = get_activation_fn(config.output_activation, framework="tf2")
+        # Keep the outputs in float32, even under a mixed-precision policy.
         layers.append(
-            tf.keras.layers.Dense(config.output_dims[0], activation=output_activation),
+            tf.keras.layers.Dense(
+                config.output_dims[0],
+                activation=output_activation,
+                dtype=tf.float32,
+            ),
         )
 
         # Create the network from gathered layers.
         self.net = tf.keras.Sequential(layers)
 
+        _TfXLAEncoderMixin.__init__(self, config)
+
     @override(Model)
     def get_input_specs(self) -> Optional[Spec]:
         return SpecDict(
@@ -96,16 +191,14 @@ class TfCNNEncoder(TfModel, Encoder):
         )
 
     @override(Model)
-    def _forward(self, inputs: NestedDict, **kwargs) -> NestedDict:
-        return NestedDict(
-            {
-                ENCODER_OUT: self.net(inputs[SampleBatch.OBS]),
-                STATE_OUT: inputs[STATE_IN],
-            }
-        )
+    def _forward(self, inputs: NestedDict, **kwargs) -> Dict:
+        return {
+            ENCODER_OUT: self.call_tensors(inputs[SampleBatch.OBS]),
+            STATE_OUT: inputs[STATE_IN],
+        }
 
 
-class TfMLPEncoder(Encoder, TfModel):
+class TfMLPEncoder(_TfXLAEncoderMixin, Encoder, TfCachedSpecsModel):
     def __init__(self, config: MLPEncoderConfig) -> None:
         TfModel.__init__(self, config)
         Encoder.__init__(self, config)
@@ -121,6 +214,8 @@ class TfMLPEncoder(Encoder, TfModel):
             use_bias=config.use_bias,
         )
 
+        _TfXLAEncoderMixin.__init__(self, config)
+
     @override(Model)
     def get_input_specs(self) -> Optional[Spec]:
         return SpecDict(
@@ -141,24 +236,47 @@ class TfMLPEncoder(Encoder, TfModel):
         )
 
     @override(Model)
-    def _forward(self, inputs: NestedDict, **kwargs) -> NestedDict:
-        return NestedDict(
-            {
-                ENCODER_OUT: self.net(inputs[SampleBatch.OBS]),
-                STATE_OUT: None,  # inputs[STATE_IN],
-            }
-        )
+    def _forward(self, inputs: NestedDict, **kwargs) -> Dict:
+        return {
+            ENCODER_OUT: self.call_tensors(inputs[SampleBatch.OBS]),
+            STATE_OUT: None,  # inputs[STATE_IN],
+        }
 
 
-class TfLSTMEncoder(TfModel, Encoder):
+class TfLSTMEncoder(TfCachedSpecsModel, Encoder):
     """An encoder that uses an LSTM cell and a linear layer."""
 
     def __init__(self, config: LSTMEncoderConfig) -> None:
         TfModel.__init__(self, config)
 
+        # Store the number of layers as a python int, so that traced functions see it
+        # as a compile-time constant (e.g. for unrolling the loop over the layers).
+        self._num_layers = int(config.num_lstm_layers)
+
         # Create the tf LSTM layers.
+        # Note: We use one `tf.keras.layers.LSTM` per layer (instead of a single
+        # `tf.keras.layers.RNN` over `StackedRNNCells`), b/c only the former can
+        # dispatch to the fused cuDNN kernel on GPU. A generic RNN over stacked
+        # cells launches num_layers small kernels per time step instead. The
+        # python loop over these layers in `_forward_impl` only runs at trace
+        # time.
         self.lstms = []
-        for _ in range(config.num_lstm_layers):
+        # `tf.keras.layers.LSTM` only uses the fused cuDNN kernel if all its settings
+        # (activations, dropout, unroll, masking, use_bias) are cuDNN compatible. We
+        # keep all of them at their defaults, except for `use_bias`, which the user
+        # may turn off.
+        if (
+            not config.use_bias
+            and tf.config.list_physical_devices("GPU")
+            and log_once("tf_lstm_encoder_no_cudnn_kernel")
+        ):
+            logger.warning(
+                "LSTMEncoderConfig.use_bias=False prevents the tf LSTM layers from "
+                "using the fused cuDNN kernel. TfLSTMEncoder will use the much "
+                "slower generic LSTM kernel on GPU! Set `use_bias=True` for "
+                "faster LSTM forward and backward passes."
+            )
+        for _ in range(self._num_layers):
             self.lstms.append(
                 tf.keras.layers.LSTM(
                     config.hidden_dim,
@@ -169,10 +287,37 @@ class TfLSTMEncoder(TfModel, Encoder):
                 )
             )
 
-        # Create the final dense layer.
+        # Create the final dense layer. Keep its outputs in float32, even under a
+        # mixed-precision policy.
         self.linear = tf.keras.layers.Dense(
             units=config.output_dims[0],
             use_bias=config.use_bias,
+            dtype=tf.float32,
+        )
+
+        # Create the initial (all-zero) states only once. tf tensors are immutable,
+        # so `get_initial_state()` (called e.g. on each episode reset) can safely
+        # return these same tensors over and over again.
+        self._initial_h = tf.zeros((self._num_layers, config.hidden_dim))
+        self._initial_c = tf.zeros((self._num_layers, config.hidden_dim))
+
+        # Trace the forward pass into a graph. Pin the input signature (with
+        # undefined batch- and time dimensions) to avoid retracing on each new batch
+        # size or sequence length.
+        # Note: Unlike the CNN- and MLP encoders, we do not `jit_compile` here, b/c
+        # XLA has no lowering for the fused cuDNN kernels that
+        # `tf.keras.layers.LSTM` dispatches to on GPU. Hence, varying batch- and
+        # sequence lengths also don't trigger any recompilations.
+        state_spec = tf.TensorSpec(
+            [None, self._num_layers, config.hidden_dim], self.compute_dtype
+        )
+        self._forward_compiled = tf.function(
+            self._forward_impl,
+            input_signature=[
+                tf.TensorSpec([None, None, config.input_dims[0]], self.compute_dtype),
+                state_spec,
+                state_spec,
+            ],
         )
 
     @override(Model)
@@ -185,12 +330,12 @@ class TfLSTMEncoder(TfModel, Encoder):
                     "h": TfTensorSpec(
                         "b, l, h",
                         h=self.config.hidden_dim,
-                        l=self.config.num_lstm_layers,
+                        l=self._num_layers,
                     ),
                     "c": TfTensorSpec(
                         "b, l, h",
                         h=self.config.hidden_dim,
-                        l=self.config.num_lstm_layers,
+                        l=self._num_layers,
                     ),
                 },
             }
@@ -205,12 +350,12 @@ class TfLSTMEncoder(TfModel, Encoder):
                     "h": TfTensorSpec(
                         "b, l, h",
                         h=self.config.hidden_dim,
-                        l=self.config.num_lstm_layers,
+                        l=self._num_layers,
                     ),
                     "c": TfTensorSpec(
                         "b, l, h",
                         h=self.config.hidden_dim,
-                        l=self.config.num_lstm_layers,
+                        l=self._num_layers,
                     ),
                 },
             }
@@ -218,32 +363,88 @@ class TfLSTMEncoder(TfModel, Encoder):
 
     @override(Model)
     def get_initial_state(self):
-        return {
-            "h": tf.zeros((self.config.num_layers, self.config.hidden_dim)),
-            "c": tf.zeros((self.config.num_layers, self.config.hidden_dim)),
-        }
+        return {"h": self._initial_h, "c": self._initial_c}
 
     @override(Model)
-    def _forward(self, inputs: NestedDict, **kwargs) -> NestedDict:
-        out = tf.cast(inputs[SampleBatch.OBS], tf.float32)
+    def _forward(self, inputs: NestedDict, **kwargs) -> Dict:
+        out, states_out_h, states_out_c = self.call_tensors(
+            inputs[SampleBatch.OBS],
+            inputs[STATE_IN]["h"],
+            inputs[STATE_IN]["c"],
+        )
 
-        # States are batch-first when coming in. Make them layers-first.
-        states_in = tree.map_structure(
-            lambda s: tf.transpose(s, perm=[1, 0, 2]),
-            inputs[STATE_IN],
+        return {
+            ENCODER_OUT: out,
+            STATE_OUT: {"h": states_out_h, "c": states_out_c},
+        }
+
+    def call_tensors(self, obs, h=None, c=None):
+        """Computes the encoder outputs and next states for a batch of sequences.
+
+        Like the CNN- and MLP encoders' `call_tensors()`, this takes and returns
+        plain tensors (no NestedDicts).
+
+        Args:
+            obs: The batch of observation sequences of shape (B, T, input_dims[0])
+                (or (T, B, input_dims[0]) if `config.batch_major` is False).
+            h: The batch-first incoming h-states of shape (B, num_lstm_layers,
+                hidden_dim). If None, uses the initial (all-zero) h-states.
+            c: The batch-first incoming c-states of shape (B, num_lstm_layers,
+                hidden_dim). If None, uses the initial (all-zero) c-states.
+
+        Returns:
+            A tuple of the encoder outputs of shape (B, T, output_dims[0]) (or
+            (T, B, output_dims[0]) if not batch-major), and the outgoing, batch-first
+            h- and c-states (in float32, like the initial states).
+        """
+        if h is None or c is None:
+            batch_size = tf.shape(obs)[0 if self.config.batch_major else 1]
+            state_shape = [batch_size, self._num_layers, self.config.hidden_dim]
+            if h is None:
+                h = tf.broadcast_to(self._initial_h, state_shape)
+            if c is None:
+                c = tf.broadcast_to(self._initial_c, state_shape)
+
+        # Cast once (and only if needed), straight to the compute dtype of our Keras
+        # dtype policy (e.g. float16 under "mixed_float16"), such that the layers
+        # inside the compiled forward pass don't have to cast again.
+        return self._forward_compiled(
+            tf.cast(obs, self.compute_dtype),
+            tf.cast(h, self.compute_dtype),
+            tf.cast(c, self.compute_dtype),
         )
 
+    def _forward_impl(self, obs, h, c):
+        out = obs
+
+        # States are batch-first when coming in. Split them into per-layer slices
+        # along the layer axis. Note: These (strided) slices copy all b*l*h elements,
+        # just like transposing into layers-first would, so this is not cheaper in
+        # terms of memory traffic.
+        h = tf.unstack(h, num=self._num_layers, axis=1)
+        c = tf.unstack(c, num=self._num_layers, axis=1)
+
         states_out_h = []
         states_out_c = []
         for i, layer in enumerate(self.lstms):
-            out, h, c = layer(out, (states_in["h"][i], states_in["c"][i]))
-            states_out_h.append(h)
-            states_out_c.append(c)
-
-        out = self.linear(out)
-
-        return {
-            ENCODER_OUT: out,
-            # Make state_out batch-first.
-            STATE_OUT: {"h": tf.stack(states_out_h, 1), "c": tf.stack(states_out_c, 1)},
-        }
+            out, h_i, c_i = layer(out, (h[i], c[i]))
+            states_out_h.append(h_i)
+            states_out_c.append(c_i)
+
+        # Apply the final dense layer on a 2D (B*T, hidden) view of the LSTM outputs.
+        # This way, the layer performs a plain MatMul followed by its BiasAdd (which
+        # grappler/XLA fuse into a single kernel) instead of a `tensordot` on the 3D
+        # tensor. The reshapes themselves are metadata-only.
+        shape = tf.shape(out)
+        out = self.linear(tf.reshape(out, [-1, self.config.hidden_dim]))
+        out = tf.reshape(out, [shape[0], shape[1], -1])
+
+        # Stack the per-layer states straight into batch-first state_out. Return them
+        # in the dtype of the initial states (float32), also under a mixed-precision
+        # policy, such that carried-over states keep their dtype (and precision) from
+        # one step to the next.
+        return (
+            out,
+            tf.cast(tf.stack(states_out_h, 1), self._initial_h.dtype),
+            tf.cast(tf.stack(states_out_c, 1), self._initial_c.dtype),
+        )
@@ -15,7 +15,8 @@ class TfMLP(tf.keras.Model):
 
     If `output_dim` (int) is not None, an additional, extra output dense layer is added,
     which might have its own activation function (e.g. "linear"). However, the output
-    layer does NOT use layer normalization.
+    layer does NOT use layer normalization. The output layer always computes in
+    float32, even if a mixed-precision Keras policy (e.g. "mixed_float16") is set.
     """
 
     def __init__(
@@ -81,11 +82,13 @@ class TfMLP(tf.keras.Model):
 
         if output_dim is not None:
             output_activation = get_activation_fn(output_activation, framework="tf2")
+            # Keep the outputs in float32, even under a mixed-precision policy.
             layers.append(
                 tf.keras.layers.Dense(
                     output_dim,
                     activation=output_activation,
                     use_bias=use_bias,
+                    dtype=tf.float32,
                 )
             )
 
@@ -150,6 +153,9 @@ class TfCNN(tf.keras.Model):
                     kernel_size=kernel_size,
                     strides=strides,
                     padding="same",
+                    # Our inputs are always NHWC. Don't let a user's Keras config
+                    # (`image_data_format`) change this.
+                    data_format="channels_last",
                     use_bias=use_bias,
                     activation=None if cnn_use_layernorm else cnn_activation,
                 )
@@ -165,7 +171,7 @@ class TfCNN(tf.keras.Model):
         # Create the final CNN network.
         self.cnn = tf.keras.Sequential(layers)
 
-        self.expected_input_dtype = tf.float32
+        self.expected_input_dtype = self.compute_dtype
 
     def call(self, inputs, **kwargs):
         return self.cnn(tf.cast(inputs, self.expected_input_dtype))
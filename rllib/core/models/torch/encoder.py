@@ -1,7 +1,5 @@
 from typing import Optional
 
-import tree
-
 from ray.rllib.core.models.base import (
     Encoder,
     ActorCriticEncoder,
@@ -223,8 +221,8 @@ class TorchLSTMEncoder(TorchModel, Encoder):
     @override(Model)
     def get_initial_state(self):
         return {
-            "h": torch.zeros(self.config.num_layers, self.config.hidden_dim),
-            "c": torch.zeros(self.config.num_layers, self.config.hidden_dim),
+            "h": torch.zeros(self.config.num_lstm_layers, self.config.hidden_dim),
+            "c": torch.zeros(self.config.num_lstm_layers, self.config.hidden_dim),
         }
 
     @override(Model)
@@ -232,15 +230,15 @@ class TorchLSTMEncoder(TorchModel, Encoder):
         out = inputs[SampleBatch.OBS].float()
 
         # States are batch-first when coming in. Make them layers-first.
-        states_in = tree.map_structure(lambda s: s.transpose(0, 1), inputs[STATE_IN])
+        h_in = inputs[STATE_IN]["h"].transpose(0, 1)
+        c_in = inputs[STATE_IN]["c"].transpose(0, 1)
 
-        out, states_out = self.lstm(out, (states_in["h"], states_in["c"]))
-        states_out = {"h": states_out[0], "c": states_out[1]}
+        out, (h_out, c_out) = self.lstm(out, (h_in, c_in))
 
         out = self.linear(out)
 
         return {
             ENCODER_OUT: out,
-            # Make states layer-first again.
-            STATE_OUT: tree.map_structure(lambda s: s.transpose(0, 1), states_out),
+            # Make states batch-first again.
+            STATE_OUT: {"h": h_out.transpose(0, 1), "c": c_out.transpose(0, 1)},
         }